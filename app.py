@@ -1,46 +1,47 @@
 # app.py
-from flask import Flask, render_template, request, jsonify
+import os
+import model_bundle # Must come before spacy/benepar (sets up the offline model cache)
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import spacy
 from spacy import displacy
-import benepar  # Import benepar
 import nltk # Import NLTK for tree parsing
+import tree_export # Headless bulk export of tree images
+import treebank # Indexed store of every parsed sentence
+import input_guard # Input budget and sentence-window segmentation
 
-# Load the spaCy model (ensure this happens only once)
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy 'en_core_web_sm' model...")
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
+app = Flask(__name__)
 
-# Load benepar model and add it to the pipeline
-try:
-    if spacy.__version__.startswith('2'):
-        nlp.add_pipe(benepar.BeneparComponent("benepar_en3"))
-    else:
-        # For spaCy v3, ensure benepar is added correctly
-        # Check benepar docs for the latest recommended way for spaCy v3+
-        # This might involve specifying the component name explicitly
-        if "benepar" not in nlp.pipe_names:
-             nlp.add_pipe("benepar", config={"model": "benepar_en3"})
-except ValueError as e:
-    # Handle cases where the component might already be added or model not found
-    print(f"Benepar component issue: {e}")
-    # Attempt to download benepar model if not found (requires user confirmation ideally)
-    # Consider adding more robust error handling or instructions here
-    try:
-        print("Attempting to download 'benepar_en3' model...")
-        import benepar.cli
-        benepar.cli.download("benepar_en3")
-        # Retry adding the pipe after download
-        if "benepar" not in nlp.pipe_names:
-             nlp.add_pipe("benepar", config={"model": "benepar_en3"})
-    except Exception as download_e:
-        print(f"Failed to download or add benepar model: {download_e}")
-        # Decide how to proceed: maybe disable constituency parsing? Exit?
-        pass # Or raise an error
+# Input budget per request (see input_guard.py for the defaults)
+INPUT_BUDGET = {
+    'max_chars': int(os.environ.get('MAX_INPUT_CHARS', input_guard.MAX_INPUT_CHARS)),
+    'max_tokens': int(os.environ.get('MAX_INPUT_TOKENS', input_guard.MAX_INPUT_TOKENS)),
+    'max_sentences': int(os.environ.get('MAX_INPUT_SENTENCES', input_guard.MAX_INPUT_SENTENCES)),
+    'max_sentence_tokens': int(os.environ.get('MAX_SENTENCE_TOKENS', input_guard.MAX_SENTENCE_TOKENS)),
+    'window_sentences': int(os.environ.get('WINDOW_SENTENCES', input_guard.WINDOW_SENTENCES)),
+}
 
-app = Flask(__name__)
+# Limits for line-based bulk input (/export): per line, plus a line count
+BULK_INPUT_LIMITS = input_guard.bulk_limits()
+
+# Request bodies are capped to what the bulk budget can use (413 beyond that).
+# 6 bytes per character leaves room for JSON \uXXXX escapes; 64 KB for the other fields.
+app.config['MAX_CONTENT_LENGTH'] = (BULK_INPUT_LIMITS['max_lines'] * (BULK_INPUT_LIMITS['max_chars'] + 1) * 6
+                                   + 64 * 1024)
+
+# Every parse is saved to the local treebank; set TREEBANK_PATH to '' to disable
+TREEBANK_PATH = os.environ.get('TREEBANK_PATH', treebank.DEFAULT_PATH)
+
+# Render processes for /export (shared pool, see tree_export.get_pool)
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', tree_export.EXPORT_WORKERS))
+
+# Load spaCy + benepar once: from the prepared offline bundle if there is one.
+# The /export render workers are spawned and re-import this file as '__mp_main__'
+# when it is run with 'python app.py'; they only render and must not load the models.
+nlp = None
+treebank_store = None
+if __name__ != '__mp_main__':
+    nlp = model_bundle.load_pipeline()
+    treebank_store = treebank.TreebankStore(TREEBANK_PATH) if TREEBANK_PATH else None
 
 # --- Constituency Label Explanations ---
 # Based on Penn Treebank tags, but can be customized
@@ -158,6 +159,7 @@ def index():
     dependency_explanations = None # Renamed for clarity
     constituency_explanations = None # For constituency labels
     error_message = None
+    notice_message = None # Partial-result note for over-long input
     sentence = ""
     parse_type = 'dependency' # Default parse type
 
@@ -167,11 +169,23 @@ def index():
 
         if sentence:
             try:
-                # Process the sentence with spaCy
-                doc = nlp(sentence)
+                # Cut the input down to the budget and process it in sentence windows
+                windows, input_report = input_guard.segment_input(sentence, **INPUT_BUDGET)
+                docs = input_guard.parse_windows(nlp, windows, input_report)
+                notice_message = input_guard.describe_report(input_report)
+
+                # Keep the parses for treebank searches; never fail the page over it
+                if treebank_store is not None:
+                    try:
+                        treebank_store.add_docs(docs, constituency='benepar' in nlp.pipe_names)
+                    except Exception as store_e:
+                        print(f"Error storing sentence '{sentence}' in treebank: {store_e}")
 
                 # --- Generate Output based on Parse Type ---
-                if parse_type == 'dependency':
+                if not docs:
+                    error_message = "Nothing could be parsed. " + (notice_message or "")
+                    notice_message = None
+                elif parse_type == 'dependency':
                     # Generate displacy HTML for dependency parse
                     options = {
                         'compact': True,
@@ -180,10 +194,10 @@ def index():
                         'font': 'Arial, sans-serif',
                         'distance': 120
                     }
-                    dependency_html_output = displacy.render(doc, style="dep", page=False, options=options)
+                    dependency_html_output = displacy.render(docs, style="dep", page=False, options=options)
                     # --- Dependency Bracketed String Logic ---
                     # Find the root(s) of the sentence(s)
-                    roots = [token for token in doc if token.head == token]
+                    roots = [token for token in docs[0] if token.head == token]
                     if roots:
                         # Assuming one sentence for simplicity, build from the first root
                         dependency_bracketed_string = build_bracketed_string(roots[0])
@@ -191,14 +205,14 @@ def index():
                         dependency_bracketed_string = "(No root found for dependency parse)"
                     # --- End Dependency Bracketed String Logic ---
                     # --- Dependency Explanation Logic ---
-                    unique_deps = sorted(list(set(token.dep_ for token in doc)))
+                    unique_deps = sorted(list(set(token.dep_ for doc in docs for token in doc)))
                     dependency_explanations = {dep: spacy.explain(dep) for dep in unique_deps if spacy.explain(dep)}
                     # --- End Dependency Explanation Logic ---
                 elif parse_type == 'constituency':
                     # Generate constituency parse string using benepar
                     # Ensure the benepar pipe has been added successfully
                     if 'benepar' in nlp.pipe_names:
-                        sent = list(doc.sents)[0] # Get the first sentence
+                        sent = list(docs[0].sents)[0] # Get the first sentence
                         constituency_parse_string = sent._.parse_string
                         # --- Convert constituency string to NLTK Tree and then to JSON ---
                         try:
@@ -241,9 +255,78 @@ def index():
                            dependency_explanations=dependency_explanations, # Pass CORRECT dependency explanations
                            constituency_explanations=constituency_explanations, # Pass constituency explanations
                            error=error_message,
+                           notice=notice_message, # Partial-result note
                            input_sentence=sentence,
                            selected_parse_type=parse_type) # Pass selected type
 
+# --- Bulk Export Route ---
+@app.route('/export', methods=['POST'])
+def export():
+    """
+    Renders many sentences to SVG/PNG/PDF and streams them back as a zip archive.
+    Accepts either a JSON body {"sentences": [...], "formats": [...], "views": [...]}
+    ('sentences' may also be a single string with one sentence per line)
+    or form fields 'sentences' (one per line), 'formats' and 'views' (checkboxes).
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Expected a JSON object.'}), 400
+        sentences = payload.get('sentences', [])
+        if isinstance(sentences, str): # Pasted text: one sentence per line
+            sentences = sentences.splitlines()
+        formats = payload.get('formats', ['svg'])
+        views = payload.get('views', list(tree_export.EXPORT_VIEWS))
+        for name, value in (('sentences', sentences), ('formats', formats), ('views', views)):
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                return jsonify({'error': f"'{name}' must be a list of strings."}), 400
+        sentences = tree_export.read_sentences(sentences)
+    else:
+        sentences = tree_export.read_sentences(request.form.get('sentences', '').splitlines())
+        formats = request.form.getlist('formats') or ['svg']
+        views = request.form.getlist('views') or list(tree_export.EXPORT_VIEWS)
+
+    if not sentences:
+        return jsonify({'error': 'Please enter at least one sentence.'}), 400
+    try:
+        tree_export.validate_options(formats, views)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Over-budget lines are listed in index.csv instead of being parsed
+    try:
+        skipped = input_guard.screen_lines(sentences, **BULK_INPUT_LIMITS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        chunks = tree_export.export_zip(nlp, sentences, formats, views, EXPORT_WORKERS, skipped)
+    except ValueError as e: # e.g. benepar missing: refuse before streaming starts
+        return jsonify({'error': str(e)}), 400
+    return Response(stream_with_context(chunks),
+                    mimetype='application/zip',
+                    headers={'Content-Disposition': 'attachment; filename=trees.zip'})
+# --- End Bulk Export Route ---
+
+# --- Treebank Search Route ---
+@app.route('/treebank/search', methods=['GET'])
+def treebank_search():
+    """
+    Searches stored parses, e.g. /treebank/search?parent=VP&label=SBAR
+    or /treebank/search?dep=nsubj&head_tag=VBN. Page with ?after=<next_after>&limit=N.
+    """
+    if treebank_store is None:
+        return jsonify({'error': 'Treebank storage is disabled.'}), 404
+    query = {key: request.args.get(key) or None
+             for key in ('label', 'parent', 'ancestor', 'dep', 'head_tag', 'dep_tag', 'pos')}
+    try:
+        page = treebank_store.search(after=request.args.get('after', 0, type=int),
+                                     limit=request.args.get('limit', treebank.DEFAULT_PAGE_SIZE, type=int),
+                                     **query)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
+# --- End Treebank Search Route ---
+
 # --- Function to extract unique labels from NLTK Tree ---
 def get_labels_from_tree(tree):
     """Recursively extracts all unique node labels from an NLTK Tree."""
@@ -3,6 +3,15 @@ import nltk
 import benepar
 import sys
 
+# Skip the network entirely when the model is already on the NLTK data path
+try:
+    nltk.data.find('models/benepar_en3')
+    print("'benepar_en3' is already installed; nothing to download.")
+    print("Run 'python model_bundle.py' to build the offline model bundle.")
+    sys.exit(0)
+except LookupError:
+    pass
+
 try:
     print("Attempting to download 'benepar_en3' using nltk...")
     # Ensure NLTK data path is configured if needed, though benepar.download might handle it.
@@ -13,4 +22,4 @@ except Exception as e:
     print(f"An error occurred during download: {e}")
     sys.exit(1) # Exit with error code if download fails
 
-print("Script finished.")
\ No newline at end of file
+print("Script finished.")
@@ -1,4 +1,6 @@
+import os
 import sys
+import model_bundle # Must come before spacy/benepar (sets up the offline model cache)
 import spacy
 from spacy import displacy
 import benepar  # Import benepar
@@ -7,38 +9,13 @@ from nltk import Tree # Import NLTK Tree for parsing the string
 import json # To handle JSON data for D3
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, QTextEdit, QPushButton, QLabel)
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtCore import Qt
-
-# Load SpaCy model (ensure this happens only once)
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy 'en_core_web_sm' model...")
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-
-# Load benepar model and add it to the pipeline
-# Using similar logic as app.py for robustness
-try:
-    if spacy.__version__.startswith('2'):
-        # Adjust based on your spacy version if needed
-        nlp.add_pipe(benepar.BeneparComponent("benepar_en3"))
-    else:
-        # For spaCy v3+
-        if "benepar" not in nlp.pipe_names:
-             nlp.add_pipe("benepar", config={"model": "benepar_en3"})
-except ValueError as e:
-    print(f"Benepar component issue: {e}. Attempting download...")
-    try:
-        import benepar.cli
-        benepar.cli.download("benepar_en3")
-        if "benepar" not in nlp.pipe_names:
-             nlp.add_pipe("benepar", config={"model": "benepar_en3"})
-    except Exception as download_e:
-        print(f"Failed to download or add benepar model: {download_e}")
-        # Consider how the GUI should handle this - maybe disable the button?
-        # For now, we'll let the parsing attempt fail later if benepar isn't loaded.
-        pass
+from PyQt6.QtCore import Qt, QUrl
+
+# D3 ships with the app (static/d3.v7.min.js), so the GUI works offline
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Load spaCy + benepar once: from the prepared offline bundle if there is one
+nlp = model_bundle.load_pipeline()
 
 # --- Constituency Label Explanations (copied from app.py) ---
 CONSTITUENCY_LABELS = {
@@ -178,10 +155,45 @@ class SyntaxTreeApp(QMainWindow):
         self.output_display.setVisible(False)
         self.layout.addWidget(self.output_display)
 
-        # Web view for visualizations
+        # Web view for visualizations: one persistent page, loaded once.
+        # Each parse pushes its data into the page via runJavaScript instead of
+        # rebuilding the whole document (and reloading D3) with setHtml.
         self.web_view = QWebEngineView()
         self.web_view.setVisible(False) # Start hidden
         self.layout.addWidget(self.web_view)
+        self.page_ready = False
+        self.pending_script = None # Latest update requested before the page finished loading
+        self.web_view.loadFinished.connect(self.on_page_loaded)
+        # Base URL on the static folder so the page loads the local D3 copy
+        self.web_view.setHtml(self.generate_page_html(), QUrl.fromLocalFile(STATIC_DIR + os.sep))
+
+    def on_page_loaded(self, ok):
+        """Runs the update that was requested while the page was still loading."""
+        self.page_ready = ok
+        if not ok:
+            self.pending_script = None
+            self.show_error("Error: the visualization page could not be loaded.")
+        elif self.pending_script:
+            self.execute_page_script(self.pending_script)
+            self.pending_script = None
+
+    def run_page_script(self, script):
+        """Runs JavaScript in the persistent page, or queues it until the page is ready."""
+        self.web_view.setVisible(True)
+        self.output_display.setVisible(False)
+        if self.page_ready:
+            self.execute_page_script(script)
+        else:
+            self.pending_script = script # Only the latest parse matters
+
+    def execute_page_script(self, script):
+        """Runs a page update; an exception in the page is reported via show_error."""
+        wrapped = f"(function() {{ try {{ {script} return null; }} catch (e) {{ return String(e); }} }})()"
+        self.web_view.page().runJavaScript(wrapped, self.on_page_script_result)
+
+    def on_page_script_result(self, result):
+        if result:
+            self.show_error(f"Error drawing the visualization: {result}")
 
     def show_error(self, message):
         """Helper to display errors in the text area."""
@@ -217,7 +229,6 @@ class SyntaxTreeApp(QMainWindow):
             try:
                 nltk_tree = Tree.fromstring(constituency_parse_string)
                 constituency_tree_json = tree_to_json(nltk_tree)
-                json_data_string = json.dumps(constituency_tree_json)
 
                 # --- Get Constituency Explanations ---
                 unique_const_labels = get_labels_from_tree(nltk_tree)
@@ -227,11 +238,10 @@ class SyntaxTreeApp(QMainWindow):
                     if label in CONSTITUENCY_LABELS
                 }
 
-                # --- Generate HTML for D3 Visualization with Legend ---
-                html_content = self.generate_constituency_html(json_data_string, constituency_explanations)
-                self.web_view.setHtml(html_content)
-                self.web_view.setVisible(True)
-                self.output_display.setVisible(False)
+                # --- Push tree and legend into the page (D3 repaints in place) ---
+                self.run_page_script(
+                    f"showConstituency({json.dumps(constituency_tree_json)}, "
+                    f"{json.dumps(list(constituency_explanations.items()))});")
 
             except Exception as tree_e:
                  self.show_error(f"Error parsing/visualizing constituency tree: {tree_e}\n\nRaw parse:\n{constituency_parse_string}")
@@ -258,28 +268,14 @@ class SyntaxTreeApp(QMainWindow):
             options = {"compact": True, "bg": "#ffffff", "color": "#000000", "font": "Arial"}
             svg = displacy.render(doc, style="dep", options=options, page=False)
 
-            # --- Generate HTML for Dependency Visualization with Legend ---
-            html_content = self.generate_dependency_html(svg, dependency_explanations)
-            self.web_view.setHtml(html_content)
-            self.web_view.setVisible(True)
-            self.output_display.setVisible(False)
+            # --- Push SVG and legend into the page ---
+            self.run_page_script(
+                f"showDependency({json.dumps(svg)}, "
+                f"{json.dumps(list(dependency_explanations.items()))});")
 
         except Exception as e:
             self.show_error(f"Error generating dependency parse: {str(e)}")
 
-    def generate_legend_html(self, explanations):
-        """Generates the HTML list for a legend."""
-        if not explanations:
-            return ""
-        items_html = "".join(f'<li><strong>{tag}:</strong> {desc}</li>'
-                             for tag, desc in explanations.items())
-        return f'''
-            <div class="explanations-list">
-                <h3>Legend</h3>
-                <ul>{items_html}</ul>
-            </div>
-        '''
-
     def get_legend_css(self):
         """Returns the CSS for the legend."""
         return """
@@ -320,9 +316,14 @@ class SyntaxTreeApp(QMainWindow):
             }
         """
 
-    def generate_constituency_html(self, json_data, explanations):
-        """Generates HTML for D3 Constituency Tree + Legend."""
-        d3_script = """
+    def generate_page_html(self):
+        """
+        Generates the persistent page: both views, the legend and the JS entry points
+        showConstituency(treeData, legendItems) and showDependency(svgMarkup, legendItems).
+        """
+        page_script = """
+            let currentTree = null;
+
             function renderD3Tree(data) {
                 const container = d3.select("#constituency-tree-container");
                 const svgElement = d3.select("#d3-tree-svg");
@@ -350,9 +351,45 @@ class SyntaxTreeApp(QMainWindow):
                 node.append("text").attr("dy", "-0.8em").attr("text-anchor", "middle").attr("class", "label").text(d => d.data.label);
                 node.filter(d => d.data.text).append("text").attr("dy", "1.8em").attr("text-anchor", "middle").attr("class", "text").text(d => d.data.text);
             }
+
+            function renderLegend(items) {
+                const legend = document.getElementById("legend");
+                const list = document.getElementById("legend-items");
+                list.replaceChildren();
+                for (const [tag, desc] of items) {
+                    const li = document.createElement("li");
+                    const strong = document.createElement("strong");
+                    strong.textContent = tag + ":";
+                    li.append(strong, " " + desc);
+                    list.append(li);
+                }
+                legend.hidden = items.length === 0;
+            }
+
+            function showConstituency(data, legendItems) {
+                if (typeof d3 === "undefined") throw new Error("D3 (static/d3.v7.min.js) could not be loaded");
+                document.getElementById("dependency-container").hidden = true;
+                document.getElementById("constituency-tree-container").hidden = false;
+                currentTree = data;
+                renderD3Tree(data);
+                renderLegend(legendItems);
+            }
+
+            function showDependency(svgMarkup, legendItems) {
+                currentTree = null;
+                document.getElementById("d3-tree-svg").replaceChildren(); // Works without D3
+                document.getElementById("constituency-tree-container").hidden = true;
+                const container = document.getElementById("dependency-container");
+                container.innerHTML = svgMarkup; // displaCy output
+                container.hidden = false;
+                renderLegend(legendItems);
+            }
+
+            window.addEventListener("resize", () => { if (currentTree) renderD3Tree(currentTree); });
         """
         css_styles = """
             body { margin: 10px; padding: 0; font-family: sans-serif; background-color: #f0f0f0; }
+            [hidden] { display: none !important; }
             #constituency-tree-container {
                 padding: 20px;
                 overflow: auto;
@@ -368,37 +405,6 @@ class SyntaxTreeApp(QMainWindow):
             .node .text { fill: #28a745; font-style: italic; }
             .link { fill: none; stroke: #ccc; stroke-width: 1.5px; }
             svg { display: block; }
-        """ + self.get_legend_css() # Add legend CSS
-
-        legend_html = self.generate_legend_html(explanations)
-
-        html = f'''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <script src="https://d3js.org/d3.v7.min.js"></script>
-            <style>{css_styles}</style>
-        </head>
-        <body>
-            <div id="constituency-tree-container">
-                <svg id="d3-tree-svg"></svg>
-            </div>
-            {legend_html}
-            <script>
-                const treeData = {json_data};
-                {d3_script}
-                if (treeData) {{ renderD3Tree(treeData); }}
-            </script>
-        </body>
-        </html>
-        '''
-        return html
-
-    def generate_dependency_html(self, svg_content, explanations):
-        """Generates HTML for Dependency SVG + Legend."""
-        css_styles = """
-            body { margin: 10px; padding: 0; font-family: sans-serif; background-color: #f0f0f0; }
             .displacy-container {
                 padding: 20px;
                 overflow: auto;
@@ -407,24 +413,26 @@ class SyntaxTreeApp(QMainWindow):
                 border-radius: 4px;
                 margin-bottom: 15px; /* Space before legend */
             }
-            /* Add specific styles for displacy SVG if needed */
-            .displacy-container svg {{ display: block; }}
         """ + self.get_legend_css() # Add legend CSS
 
-        legend_html = self.generate_legend_html(explanations)
-
         html = f'''
         <!DOCTYPE html>
         <html>
         <head>
             <meta charset="UTF-8">
+            <script src="d3.v7.min.js"></script>
             <style>{css_styles}</style>
         </head>
         <body>
-            <div class="displacy-container">
-                {svg_content}
+            <div id="constituency-tree-container" hidden>
+                <svg id="d3-tree-svg"></svg>
+            </div>
+            <div id="dependency-container" class="displacy-container" hidden></div>
+            <div id="legend" class="explanations-list" hidden>
+                <h3>Legend</h3>
+                <ul id="legend-items"></ul>
             </div>
-            {legend_html}
+            <script>{page_script}</script>
         </body>
         </html>
         '''
@@ -0,0 +1,183 @@
+# input_guard.py
+"""
+Input budget and segmentation for the parsers.
+
+Long input is cut down to a fixed budget (characters, tokens, sentences) with a
+cheap rule-based sentence splitter before anything reaches the full pipeline.
+The kept sentences are grouped into small windows that are parsed one at a time,
+so the latency and peak memory of a single request have a known ceiling.
+Sentences that are too long for benepar are skipped and reported instead of
+failing the whole request. Line-based bulk input (tree export, treebank import)
+is screened line by line with screen_lines().
+"""
+import os
+
+import spacy
+
+# --- Default budget (override via environment variables in app.py) ---
+MAX_INPUT_CHARS = 5000       # Characters read from the input at all
+MAX_INPUT_TOKENS = 1000      # Tokens parsed per request
+MAX_INPUT_SENTENCES = 25     # Sentences parsed per request
+MAX_SENTENCE_TOKENS = 150    # Longer sentences are skipped (benepar has a hard length limit)
+WINDOW_SENTENCES = 5         # Sentences per nlp() call
+MAX_BULK_LINES = 1000        # Lines per bulk export / treebank import
+# --- End default budget ---
+
+_splitter = None
+
+
+def sentence_splitter():
+    """Blank English tokenizer + rule-based sentencizer; loaded once, no model needed."""
+    global _splitter
+    if _splitter is None:
+        splitter = spacy.blank("en")
+        if spacy.__version__.startswith('2'):
+            splitter.add_pipe(splitter.create_pipe("sentencizer"))
+        else:
+            splitter.add_pipe("sentencizer")
+        _splitter = splitter
+    return _splitter
+
+
+def segment_input(text,
+                  max_chars=MAX_INPUT_CHARS,
+                  max_tokens=MAX_INPUT_TOKENS,
+                  max_sentences=MAX_INPUT_SENTENCES,
+                  max_sentence_tokens=MAX_SENTENCE_TOKENS,
+                  window_sentences=WINDOW_SENTENCES):
+    """
+    Splits text into sentence windows that fit the budget.
+    Returns (windows, report) where windows is a list of strings to pass to nlp()
+    and report is a dict describing what was kept and what was left out.
+    """
+    report = {
+        'truncated_chars': len(text) > max_chars,
+        'total_sentences': 0,
+        'processed_sentences': 0,
+        'skipped_long': [], # Token counts of sentences too long to parse
+        'dropped_sentences': 0, # Sentences beyond the token/sentence budget
+        'failed_sentences': 0, # Sentences the pipeline raised on (see parse_windows)
+        'limits': {'chars': max_chars, 'tokens': max_tokens, 'sentences': max_sentences,
+                   'sentence_tokens': max_sentence_tokens},
+    }
+    if report['truncated_chars']:
+        # Cut at the last whitespace so no word is split in half
+        cut = text.rfind(" ", 0, max_chars)
+        text = text[:cut if cut > 0 else max_chars]
+
+    kept = []
+    tokens_used = 0
+    budget_used_up = False
+    for sent in sentence_splitter()(text).sents:
+        sentence = sent.text.strip()
+        if not sentence:
+            continue
+        report['total_sentences'] += 1
+        n_tokens = len(sent)
+        # Once the budget is used up nothing later is taken, so the parsed
+        # text is a contiguous prefix of the input (apart from skipped long sentences)
+        if not budget_used_up and n_tokens <= max_sentence_tokens:
+            budget_used_up = len(kept) >= max_sentences or tokens_used + n_tokens > max_tokens
+        if budget_used_up:
+            report['dropped_sentences'] += 1
+        elif n_tokens > max_sentence_tokens:
+            report['skipped_long'].append(n_tokens)
+        else:
+            kept.append(sentence)
+            tokens_used += n_tokens
+    report['processed_sentences'] = len(kept)
+
+    windows = [" ".join(kept[i:i + window_sentences])
+               for i in range(0, len(kept), window_sentences)]
+    return windows, report
+
+
+def check_line(text,
+               max_chars=MAX_INPUT_CHARS,
+               max_tokens=MAX_INPUT_TOKENS,
+               max_sentence_tokens=MAX_SENTENCE_TOKENS):
+    """
+    Budget check for line-based bulk input (export, treebank import), where each
+    line is parsed as a whole. Returns the reason to skip the line, or None.
+    """
+    if len(text) > max_chars:
+        return f"Skipped: longer than {max_chars} characters"
+    doc = sentence_splitter()(text)
+    if len(doc) > max_tokens:
+        return f"Skipped: longer than {max_tokens} tokens"
+    if any(len(sent) > max_sentence_tokens for sent in doc.sents):
+        return f"Skipped: contains a sentence longer than {max_sentence_tokens} tokens"
+    return None
+
+
+def bulk_limits(max_lines=None):
+    """
+    Limits for line-based bulk input, read from the same environment variables
+    as app.py (MAX_BULK_LINES, MAX_INPUT_CHARS, ...). max_lines overrides MAX_BULK_LINES.
+    """
+    return {
+        'max_lines': max_lines if max_lines is not None
+                     else int(os.environ.get('MAX_BULK_LINES', MAX_BULK_LINES)),
+        'max_chars': int(os.environ.get('MAX_INPUT_CHARS', MAX_INPUT_CHARS)),
+        'max_tokens': int(os.environ.get('MAX_INPUT_TOKENS', MAX_INPUT_TOKENS)),
+        'max_sentence_tokens': int(os.environ.get('MAX_SENTENCE_TOKENS', MAX_SENTENCE_TOKENS)),
+    }
+
+
+def screen_lines(lines, max_lines=MAX_BULK_LINES, **limits):
+    """
+    Applies check_line to every line. Returns {line index: reason} for the lines
+    that must not be parsed. Raises ValueError for more than max_lines lines, so
+    callers refuse (web) or cut (command line) over-long input before it is queued.
+    """
+    if len(lines) > max_lines:
+        raise ValueError(f"Too many lines: {len(lines)} given, at most {max_lines} allowed.")
+    skipped = {}
+    for index, line in enumerate(lines):
+        reason = check_line(line, **limits)
+        if reason:
+            skipped[index] = reason
+    return skipped
+
+
+def describe_report(report):
+    """Human-readable note about partial results, or None if everything was processed."""
+    limits = report['limits']
+    notes = []
+    if report['truncated_chars']:
+        notes.append(f"only the first {limits['chars']} characters were read")
+    if report['skipped_long']:
+        notes.append(f"{len(report['skipped_long'])} sentence(s) longer than "
+                     f"{limits['sentence_tokens']} tokens were skipped")
+    if report['failed_sentences']:
+        notes.append(f"{report['failed_sentences']} sentence(s) could not be parsed")
+    if report['dropped_sentences']:
+        notes.append(f"{report['dropped_sentences']} sentence(s) beyond the limit of "
+                     f"{limits['sentences']} sentences / {limits['tokens']} tokens were not parsed")
+    if not notes:
+        return None
+    return (f"Partial result: parsed {report['processed_sentences']} of "
+            f"{report['total_sentences']} sentence(s); " + "; ".join(notes) + ".")
+
+
+def parse_windows(nlp, windows, report):
+    """
+    Runs nlp() on one window at a time. If a window fails (e.g. benepar's length
+    limit), its sentences are retried one by one and only the failing ones are
+    left out and counted in the report. Returns the list of parsed Docs.
+    """
+    docs = []
+    for window in windows:
+        try:
+            docs.append(nlp(window))
+            continue
+        except Exception as e:
+            print(f"Error processing window, retrying sentence by sentence: {e}")
+        for sent in sentence_splitter()(window).sents:
+            try:
+                docs.append(nlp(sent.text))
+            except Exception as e:
+                report['failed_sentences'] += 1
+                report['processed_sentences'] -= 1
+                print(f"Error processing sentence '{sent.text}': {e}")
+    return docs
@@ -0,0 +1,418 @@
+# loadtest.py
+"""
+Local load generator for the Flask app.
+
+Starts the app on localhost (or uses one you started yourself), drives the
+'/' route (and optionally a JSON parse API) with a mix of sentences, and sweeps
+the number of concurrent users. For each level it reports throughput,
+latency percentiles, error rate and the memory of each server process, as JSON
+that can be compared across releases.
+
+Usage:
+    python loadtest.py --concurrency 1,2,4,8 --requests 200 -o report.json
+    python loadtest.py --url http://127.0.0.1:5000 --server-pid 12345
+    python loadtest.py --baseline last_release.json -o report.json
+
+Only the standard library is needed. Memory is read from /proc, or through psutil
+when it is installed; elsewhere it is reported as null. Targets other than
+localhost are refused.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Optional: per-process memory on every platform; without it /proc is used (Linux)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+DEFAULT_CONCURRENCY = "1,2,4,8,16"
+DEFAULT_REQUESTS = 100       # Requests per concurrency level
+WARMUP_REQUESTS = 5          # Not measured; loads models and caches
+REQUEST_TIMEOUT = 120        # Seconds
+MEMORY_SAMPLE_INTERVAL = 0.5 # Seconds
+
+# Ignores http_proxy & co., so "localhost" traffic never leaves the machine
+OPENER = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+# --- Sentence mix: (weight, sentence) ---
+# Mostly short classroom sentences, some longer ones, a few multi-sentence pastes
+SENTENCE_MIX = [
+    (10, "The cat sat on the mat."),
+    (10, "She reads a book every evening."),
+    (8, "The students who finished early went home."),
+    (8, "I know that he left before the meeting started."),
+    (6, "The cake was eaten by the children at the party."),
+    (6, "Although it was raining, we decided to walk to the station."),
+    (5, "Did you see the man with the telescope?"),
+    (4, "The committee, which had been meeting since early morning, finally announced "
+        "that the new policy would take effect at the beginning of next semester."),
+    (3, "Running quickly, the boy caught the bus that was about to leave the stop."),
+    (2, "My brother lives in London. He works at a small bakery near the river. "
+        "Every weekend he visits our parents in the countryside."),
+]
+PARSE_TYPE_MIX = [(7, "dependency"), (3, "constituency")]
+# --- End sentence mix ---
+
+
+def weighted_choice(rng, items):
+    weights, values = zip(*items)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+# --- Server handling ---
+def check_local(url):
+    """Refuses anything that is not a localhost URL."""
+    host = urllib.parse.urlparse(url).hostname
+    if host not in LOCAL_HOSTS:
+        raise ValueError(f"Refusing to load-test '{host}': only {', '.join(LOCAL_HOSTS)} are allowed.")
+
+
+def check_api_path(path):
+    """Refuses an --api value that is not a path on the target server (e.g. '//host/...')."""
+    if not path.startswith("/") or path.startswith("//"):
+        raise ValueError(f"'--api' must be a path on the target server starting with a single '/', got '{path}'.")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, log_file, treebank_dir):
+    """Starts app.py with Flask's threaded server on localhost, without debugger or reloader."""
+    env = dict(os.environ)
+    # Parses are still stored, but not in the real treebank
+    env.setdefault('TREEBANK_PATH', os.path.join(treebank_dir, "treebank.sqlite3"))
+    return subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--no-reload", "--no-debugger", "--with-threads"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_for_server(url, process=None, timeout=300):
+    """Polls the URL until it answers (model loading can take a while)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} during start-up.")
+        try:
+            with OPENER.open(url, timeout=5):
+                return
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not come up within {timeout}s.")
+
+
+def memory_supported():
+    """Whether process memory can be measured here (psutil, or Linux /proc)."""
+    return psutil is not None or os.path.isdir("/proc")
+
+
+def process_tree(pid):
+    """The server process and all of its descendants (e.g. gunicorn workers)."""
+    if psutil is not None:
+        try:
+            return [pid] + [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return [pid]
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+
+def rss_mb(pid):
+    """Resident set size of a process in MB, or None if it is gone."""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler(threading.Thread):
+    """Samples the RSS of every server process while a level is running."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = {}
+        self.last = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(MEMORY_SAMPLE_INTERVAL)
+
+    def sample(self):
+        # Memory is a side measurement: never let it abort the load test
+        try:
+            for pid in process_tree(self.pid):
+                value = rss_mb(pid)
+                if value is not None:
+                    self.last[pid] = value
+                    self.peak[pid] = max(value, self.peak.get(pid, 0))
+        except OSError as e:
+            print(f"Memory sampling failed: {e}", file=sys.stderr)
+
+    def stop(self):
+        """Returns {pid: {'peak', 'end'}} in MB, or None if nothing could be measured."""
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        if not self.peak:
+            return None
+        return {str(pid): {"peak": round(self.peak[pid], 1), "end": round(self.last[pid], 1)}
+                for pid in sorted(self.peak)}
+# --- End server handling ---
+
+
+# --- Load generation ---
+def build_request(base_url, rng, sentences, api_path=None):
+    """Builds one request from the mix: the HTML form route, or the JSON API if given."""
+    sentence = weighted_choice(rng, sentences)
+    parse_type = weighted_choice(rng, PARSE_TYPE_MIX)
+    if api_path and rng.random() < 0.5:
+        body = json.dumps({"sentence": sentence, "parse_type": parse_type}).encode("utf-8")
+        url = urllib.parse.urljoin(base_url, api_path)
+        check_local(url)
+        return urllib.request.Request(url, data=body,
+                                      headers={"Content-Type": "application/json"}), "api"
+    body = urllib.parse.urlencode({"sentence": sentence, "parse_type": parse_type}).encode("utf-8")
+    return urllib.request.Request(urllib.parse.urljoin(base_url, "/"), data=body), "form"
+
+
+def send(request, kind):
+    """Sends a request and returns (latency_seconds, error or None)."""
+    start = time.perf_counter()
+    try:
+        with OPENER.open(request, timeout=REQUEST_TIMEOUT) as response:
+            body = response.read()
+        latency = time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return time.perf_counter() - start, f"HTTP {e.code}"
+    except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+        return time.perf_counter() - start, type(e).__name__
+    # The form route answers 200 even when parsing failed; look for the error block
+    if kind == "form" and b'class="error"' in body:
+        return latency, "parse error"
+    return latency, None
+
+
+def run_level(base_url, concurrency, n_requests, sentences, api_path, server_pid, seed):
+    """Sends n_requests with the given number of concurrent users and summarises them."""
+    rng = random.Random(seed)
+    requests = [build_request(base_url, rng, sentences, api_path) for _ in range(n_requests)]
+
+    sampler = MemorySampler(server_pid) if server_pid and memory_supported() else None
+    if sampler:
+        sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda item: send(*item), requests))
+    duration = time.perf_counter() - start
+    memory = sampler.stop() if sampler else None
+
+    latencies = sorted(latency * 1000 for latency, error in results if error is None)
+    errors = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    n_errors = sum(errors.values())
+
+    def ms(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round((n_requests - n_errors) / duration, 2) if duration else None,
+        "error_rate": round(n_errors / n_requests, 4),
+        "errors": errors,
+        "latency_ms": {
+            "min": ms(latencies[0] if latencies else None),
+            "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        "memory_rss_mb": memory,
+    }
+# --- End load generation ---
+
+
+def compare(report, baseline):
+    """Prints throughput and p95 changes per concurrency level against an older report."""
+    old_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    print("\nChange vs. baseline:", file=sys.stderr)
+    for level in report["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if not old:
+            continue
+        parts = [f"  c={level['concurrency']:>3}"]
+        for label, new_value, old_value in (
+                ("throughput", level["throughput_rps"], old["throughput_rps"]),
+                ("p95", level["latency_ms"]["p95"], old["latency_ms"]["p95"])):
+            if new_value is not None and old_value:
+                parts.append(f"{label} {100 * (new_value - old_value) / old_value:+.1f}%")
+        print("  ".join(parts), file=sys.stderr)
+
+
+def print_summary(report):
+    print(f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'max RSS MB':>11}",
+          file=sys.stderr)
+    for level in report["levels"]:
+        latency = level["latency_ms"]
+        memory = level["memory_rss_mb"]
+        peak = max((m["peak"] for m in memory.values()), default=None) if memory else None
+        print(f"{level['concurrency']:>5} {level['throughput_rps'] or 0:>8.2f} "
+              f"{latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} {latency['p99'] or 0:>9.1f} "
+              f"{level['error_rate']:>7.1%} {peak or 0:>11.1f}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Flask app on localhost.")
+    parser.add_argument("--url", help="Base URL of an already running local server (default: start one)")
+    parser.add_argument("--server-pid", type=int, help="PID of that server, for memory sampling")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY,
+                        help=f"Comma-separated concurrency levels (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS,
+                        help=f"Requests per level (default: {DEFAULT_REQUESTS})")
+    parser.add_argument("--api", help="Path of a JSON parse API to drive alongside '/', e.g. /api/parse")
+    parser.add_argument("--sentences", help="Text file with one sentence per line instead of the built-in mix")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the request mix")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("-o", "--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.url:
+            check_local(args.url)
+        if args.api:
+            check_api_path(args.api)
+    except ValueError as e:
+        parser.error(str(e))
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    if args.sentences:
+        with open(args.sentences, encoding="utf-8") as f:
+            sentences = [(1, line.strip()) for line in f if line.strip()]
+    else:
+        sentences = SENTENCE_MIX
+
+    process = None
+    log_file = None
+    treebank_dir = None
+    try:
+        if args.url:
+            base_url = args.url
+            server_pid = args.server_pid
+            wait_for_server(base_url)
+        else:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}/"
+            log_file = tempfile.NamedTemporaryFile(prefix="loadtest-server-", suffix=".log", delete=False)
+            print(f"Starting server on {base_url} (log: {log_file.name})...", file=sys.stderr)
+            treebank_dir = tempfile.TemporaryDirectory(prefix="loadtest-")
+            process = start_server(port, log_file, treebank_dir.name)
+            server_pid = process.pid
+            wait_for_server(base_url, process)
+
+        # Warm-up: first parses load lazy parts of the models
+        rng = random.Random(args.seed)
+        for _ in range(WARMUP_REQUESTS):
+            send(*build_request(base_url, rng, sentences, args.api))
+
+        report = {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "target": base_url,
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests_per_level": args.requests,
+            "sentences": len(sentences),
+            "api": args.api,
+            "seed": args.seed,
+            "levels": [],
+        }
+        for concurrency in levels:
+            print(f"Running {args.requests} requests at concurrency {concurrency}...", file=sys.stderr)
+            report["levels"].append(run_level(base_url, concurrency, args.requests, sentences,
+                                              args.api, server_pid, args.seed + concurrency))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if log_file is not None:
+            log_file.close()
+        if treebank_dir is not None:
+            treebank_dir.cleanup()
+
+    print_summary(report)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
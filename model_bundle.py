@@ -0,0 +1,279 @@
+# model_bundle.py
+"""
+Offline model bundle for fast, deterministic start-up.
+
+Prepare once (needs network the first time):
+    python model_bundle.py [--output model_bundle]
+
+This writes a self-contained directory:
+    pipeline/     spaCy pipeline with benepar attached (nlp.to_disk)
+    benepar_en3/  copy of the benepar model
+    hf_cache/     Hugging Face cache holding the tokenizer benepar needs
+    bundle.json   pinned versions and the measured cold-start time
+
+app.py and gui.py call load_pipeline(), which loads the bundle straight from
+disk with Hugging Face network access switched off. Without a bundle it falls
+back to the old load-or-download behaviour.
+
+Import this module before spacy/benepar: the Hugging Face cache and offline
+settings are read from the environment when transformers is first imported.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BUNDLE_DIR = os.environ.get('MODEL_BUNDLE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_bundle'))
+SPACY_MODEL = "en_core_web_sm"
+BENEPAR_MODEL = "benepar_en3"
+MANIFEST = "bundle.json"
+COLD_START_SENTENCE = "The quick brown fox jumps over the lazy dog."
+HF_OFFLINE_KEYS = ('HF_HUB_OFFLINE', 'TRANSFORMERS_OFFLINE')
+# (package, manifest key) of the versions a bundle is tied to
+PINNED_PACKAGES = (("spacy", "spacy_version"), ("benepar", "benepar_version"),
+                   ("torch", "torch_version"), ("transformers", "transformers_version"))
+
+# Settings exported by the user before start-up always win over the bundle's
+_USER_ENV = frozenset(key for key in ('HF_HOME',) + HF_OFFLINE_KEYS if key in os.environ)
+
+
+def bundle_exists(path=BUNDLE_DIR):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def use_bundle_environment(path=BUNDLE_DIR, offline=True):
+    """
+    Points Hugging Face at the bundle's cache and switches its network access off
+    (or back on with offline=False, e.g. to fetch a missing file into the cache).
+    Only takes effect if transformers has not been imported yet.
+    """
+    if 'HF_HOME' not in _USER_ENV:
+        os.environ['HF_HOME'] = os.path.join(path, 'hf_cache')
+    for key in HF_OFFLINE_KEYS:
+        if key in _USER_ENV:
+            continue
+        if offline:
+            os.environ[key] = '1'
+        else:
+            os.environ.pop(key, None)
+
+
+def _package_version(name):
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+# --- Loading ---
+def version_mismatches(manifest):
+    """Lists the pinned packages whose installed version differs from the manifest's."""
+    mismatches = []
+    for package, key in PINNED_PACKAGES:
+        pinned, installed = manifest.get(key), _package_version(package)
+        if pinned != installed:
+            mismatches.append(f"{package} {pinned} in bundle, {installed} installed")
+    return mismatches
+
+
+def load_bundle(path=BUNDLE_DIR):
+    """Loads the prepared pipeline from disk. Never downloads anything."""
+    import spacy
+    import benepar  # Registers the "benepar" factory with spaCy
+
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    mismatches = version_mismatches(manifest)
+    if mismatches:
+        print(f"Warning: model bundle was prepared with different package versions "
+              f"({'; '.join(mismatches)}). Re-run 'python model_bundle.py' if loading fails.")
+
+    # The benepar model path is stored relative to the bundle so the directory can be moved
+    return spacy.load(os.path.join(path, "pipeline"),
+                      config={"components.benepar.model": os.path.join(path, BENEPAR_MODEL)})
+
+
+def load_legacy_pipeline():
+    """Loads the installed models, downloading them when missing (pre-bundle behaviour)."""
+    import spacy
+    import benepar
+
+    # Load the spaCy model (ensure this happens only once)
+    try:
+        nlp = spacy.load(SPACY_MODEL)
+    except OSError:
+        print(f"Downloading spaCy '{SPACY_MODEL}' model...")
+        spacy.cli.download(SPACY_MODEL)
+        nlp = spacy.load(SPACY_MODEL)
+
+    # Load benepar model and add it to the pipeline
+    try:
+        if spacy.__version__.startswith('2'):
+            nlp.add_pipe(benepar.BeneparComponent(BENEPAR_MODEL))
+        else:
+            if "benepar" not in nlp.pipe_names:
+                nlp.add_pipe("benepar", config={"model": BENEPAR_MODEL})
+    except ValueError as e:
+        # Handle cases where the component might already be added or model not found
+        print(f"Benepar component issue: {e}")
+        try:
+            print(f"Attempting to download '{BENEPAR_MODEL}' model...")
+            benepar.download(BENEPAR_MODEL)
+            if "benepar" not in nlp.pipe_names:
+                nlp.add_pipe("benepar", config={"model": BENEPAR_MODEL})
+        except Exception as download_e:
+            # Constituency parsing stays unavailable; callers check nlp.pipe_names
+            print(f"Failed to download or add benepar model: {download_e}")
+    return nlp
+
+
+def load_pipeline(path=BUNDLE_DIR):
+    """Loads the bundle if it has been prepared, otherwise the legacy load-or-download path."""
+    if bundle_exists(path):
+        use_bundle_environment(path) # Already done at import for the default BUNDLE_DIR
+        return load_bundle(path)
+    print(f"No model bundle found at '{path}'; run 'python model_bundle.py' for fast offline start-up.")
+    return load_legacy_pipeline()
+# --- End loading ---
+
+
+# --- Preparing ---
+def _find_benepar_model(name):
+    """Returns the unpacked benepar model directory from the NLTK data path, downloading it if needed."""
+    import nltk
+    import benepar
+
+    try:
+        pointer = nltk.data.find(f"models/{name}")
+    except LookupError:
+        print(f"Downloading '{name}' model...")
+        benepar.download(name)
+        pointer = nltk.data.find(f"models/{name}")
+    model_dir = getattr(pointer, "path", str(pointer))
+    if not os.path.isdir(model_dir):
+        raise RuntimeError(f"Expected an unpacked model directory for '{name}', found '{model_dir}'.")
+    return model_dir
+
+
+def measure_cold_start(path=BUNDLE_DIR):
+    """
+    Loads the bundle in a fresh interpreter and returns
+    (load_seconds, first_parse_seconds), including the import of spaCy/benepar.
+    """
+    script = (
+        "import time; t0 = time.perf_counter(); "
+        "import model_bundle; nlp = model_bundle.load_bundle(); t1 = time.perf_counter(); "
+        f"nlp({COLD_START_SENTENCE!r}); t2 = time.perf_counter(); "
+        "print(t1 - t0, t2 - t1)"
+    )
+    env = dict(os.environ, MODEL_BUNDLE=os.path.abspath(path))
+    for key in ('HF_HOME',) + HF_OFFLINE_KEYS:
+        env.pop(key, None) # Let the child configure itself exactly like app.py would
+    output = subprocess.run([sys.executable, "-c", script], env=env, check=True,
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    load_seconds, parse_seconds = (float(value) for value in output.split()[-2:])
+    return load_seconds, parse_seconds
+
+
+def prepare_bundle(path=BUNDLE_DIR, spacy_model=SPACY_MODEL, benepar_model=BENEPAR_MODEL):
+    """
+    Builds the bundle directory (replacing an existing one) and returns its manifest.
+    Must run before transformers is imported in this process, so the tokenizer
+    is downloaded into the bundle's own Hugging Face cache.
+    """
+    if 'huggingface_hub' in sys.modules:
+        raise RuntimeError("prepare_bundle() must run before transformers/benepar are imported; "
+                           "use 'python model_bundle.py'.")
+
+    path = os.path.abspath(path)
+    staging = path + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    # Online while preparing, with the tokenizer cached inside the bundle being built
+    os.environ['HF_HOME'] = os.path.join(staging, 'hf_cache')
+    for key in HF_OFFLINE_KEYS:
+        os.environ.pop(key, None)
+
+    import spacy
+
+    if spacy.__version__.startswith('2'):
+        raise RuntimeError("Model bundles need spaCy v3 or later.")
+
+    benepar_dir = os.path.join(staging, benepar_model)
+    shutil.copytree(_find_benepar_model(benepar_model), benepar_dir)
+
+    try:
+        nlp = spacy.load(spacy_model)
+    except OSError:
+        print(f"Downloading spaCy '{spacy_model}' model...")
+        spacy.cli.download(spacy_model)
+        nlp = spacy.load(spacy_model)
+    nlp.add_pipe("benepar", config={"model": benepar_dir})
+    nlp(COLD_START_SENTENCE) # Fetches the benepar tokenizer into hf_cache while online
+    nlp.to_disk(os.path.join(staging, "pipeline"))
+
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python_version": platform.python_version(),
+        "spacy_version": _package_version("spacy"),
+        "spacy_model": spacy_model,
+        "spacy_model_version": nlp.meta.get("version"),
+        "benepar_model": benepar_model,
+        "benepar_version": _package_version("benepar"),
+        "torch_version": _package_version("torch"),
+        "transformers_version": _package_version("transformers"),
+        "pipeline": nlp.pipe_names,
+    }
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # The staging copy must load offline in a fresh interpreter before it replaces anything
+    try:
+        load_seconds, parse_seconds = measure_cold_start(staging)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"The new bundle in '{staging}' failed to load; the existing bundle was kept.\n"
+                           f"{(e.stderr or '').strip()}") from e
+    manifest["cold_start_seconds"] = round(load_seconds, 3)
+    manifest["first_parse_seconds"] = round(parse_seconds, 3)
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap in the finished bundle only once everything has been written and checked
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    return manifest
+# --- End preparing ---
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare the offline spaCy + benepar model bundle.")
+    parser.add_argument("--output", default=BUNDLE_DIR, help=f"Bundle directory (default: {BUNDLE_DIR})")
+    parser.add_argument("--spacy-model", default=SPACY_MODEL)
+    parser.add_argument("--benepar-model", default=BENEPAR_MODEL)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        manifest = prepare_bundle(args.output, args.spacy_model, args.benepar_model)
+    except RuntimeError as e:
+        print(f"Error preparing the model bundle: {e}")
+        sys.exit(1)
+    print(f"Model bundle written to '{args.output}' in {time.perf_counter() - start:.1f}s")
+    print(f"  spaCy {manifest['spacy_version']}, {manifest['spacy_model']} {manifest['spacy_model_version']}, "
+          f"{manifest['benepar_model']} (benepar {manifest['benepar_version']})")
+    print(f"  Cold start: {manifest['cold_start_seconds']:.2f}s to load, "
+          f"{manifest['first_parse_seconds']:.2f}s for the first parse")
+
+
+if __name__ == '__main__':
+    main()
+elif bundle_exists():
+    use_bundle_environment()
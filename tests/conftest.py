@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+import sys
+
+from spacy.tokens import Span
+
+# The modules live in the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stands in for benepar: parse strings are looked up by the sentence's first token
+# in doc.user_data["parses"], which the tests fill in
+Span.set_extension("parse_string", getter=lambda span: span.doc.user_data["parses"][span.start],
+                   force=True)
@@ -0,0 +1,113 @@
+# tests/test_input_guard.py
+import pytest
+
+import input_guard
+
+# Token counts with the blank English tokenizer (punctuation is a token)
+SHORT = "Dogs bark."                          # 3 tokens
+MEDIUM = "The old dog barked at the cat."     # 8 tokens
+LONG = "The very old and tired dog barked loudly at the small grey cat today."  # 15 tokens
+
+
+def segment(sentences, **limits):
+    return input_guard.segment_input(" ".join(sentences), **limits)
+
+
+def test_everything_within_budget():
+    windows, report = segment([SHORT, MEDIUM])
+    assert windows == [f"{SHORT} {MEDIUM}"]
+    assert report["processed_sentences"] == report["total_sentences"] == 2
+    assert input_guard.describe_report(report) is None
+
+
+def test_windows_group_sentences():
+    windows, report = segment([SHORT] * 7, window_sentences=3)
+    assert [window.count(SHORT) for window in windows] == [3, 3, 1]
+    assert report["processed_sentences"] == 7
+
+
+def test_sentence_cap_keeps_a_prefix():
+    windows, report = segment([SHORT, MEDIUM, SHORT, MEDIUM], max_sentences=2)
+    assert windows == [f"{SHORT} {MEDIUM}"]
+    assert report["dropped_sentences"] == 2
+
+
+def test_token_budget_stops_at_first_sentence_over_budget():
+    # SHORT would still fit after MEDIUM is refused, but must not be picked up
+    windows, report = segment([MEDIUM, MEDIUM, SHORT], max_tokens=12)
+    assert windows == [MEDIUM]
+    assert report["processed_sentences"] == 1
+    assert report["dropped_sentences"] == 2
+
+
+def test_token_budget_exactly_used_up():
+    windows, report = segment([MEDIUM, SHORT, SHORT], max_tokens=11)
+    assert windows == [f"{MEDIUM} {SHORT}"]
+    assert report["dropped_sentences"] == 1
+
+
+def test_long_sentences_are_skipped_not_budgeted():
+    windows, report = segment([SHORT, LONG, MEDIUM], max_sentence_tokens=10, max_tokens=11)
+    assert windows == [f"{SHORT} {MEDIUM}"]
+    assert report["skipped_long"] == [15]
+    assert report["dropped_sentences"] == 0
+
+
+def test_long_sentence_after_budget_counts_as_dropped():
+    windows, report = segment([MEDIUM, MEDIUM, LONG], max_sentence_tokens=10, max_tokens=8)
+    assert windows == [MEDIUM]
+    assert report["skipped_long"] == []
+    assert report["dropped_sentences"] == 2
+
+
+def test_char_limit_cuts_at_whitespace():
+    windows, report = input_guard.segment_input("Dogs bark loudly", max_chars=12)
+    assert report["truncated_chars"]
+    assert windows == ["Dogs bark"]
+
+
+def test_char_limit_without_whitespace():
+    windows, report = input_guard.segment_input("Supercalifragilistic", max_chars=5)
+    assert windows == ["Super"]
+
+
+def test_empty_input():
+    windows, report = input_guard.segment_input("   ")
+    assert windows == []
+    assert report["total_sentences"] == 0
+    assert input_guard.describe_report(report) is None
+
+
+def test_describe_report():
+    _, report = segment([SHORT, LONG, MEDIUM, SHORT], max_sentence_tokens=10, max_sentences=2)
+    note = input_guard.describe_report(report)
+    assert note.startswith("Partial result: parsed 2 of 4 sentence(s)")
+    assert "1 sentence(s) longer than 10 tokens were skipped" in note
+    assert "1 sentence(s) beyond the limit of 2 sentences" in note
+
+
+def test_check_line():
+    assert input_guard.check_line(MEDIUM) is None
+    assert "characters" in input_guard.check_line(MEDIUM, max_chars=10)
+    assert "longer than 5 tokens" in input_guard.check_line(MEDIUM, max_tokens=5)
+    assert "sentence longer than 5" in input_guard.check_line(f"{SHORT} {MEDIUM}", max_sentence_tokens=5)
+
+
+def test_screen_lines():
+    skipped = input_guard.screen_lines([SHORT, LONG, MEDIUM], max_lines=3, max_sentence_tokens=10)
+    assert skipped == {1: "Skipped: contains a sentence longer than 10 tokens"}
+
+
+def test_screen_lines_refuses_input_over_the_line_cap():
+    with pytest.raises(ValueError, match="at most 3"):
+        input_guard.screen_lines([SHORT] * 4, max_lines=3)
+
+
+def test_bulk_limits_from_environment(monkeypatch):
+    monkeypatch.setenv("MAX_BULK_LINES", "7")
+    monkeypatch.setenv("MAX_INPUT_CHARS", "100")
+    limits = input_guard.bulk_limits()
+    assert limits["max_lines"] == 7
+    assert limits["max_chars"] == 100
+    assert limits["max_sentence_tokens"] == input_guard.MAX_SENTENCE_TOKENS
+    assert input_guard.bulk_limits(max_lines=2)["max_lines"] == 2
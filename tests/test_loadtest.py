@@ -0,0 +1,70 @@
+# tests/test_loadtest.py
+import http.server
+import threading
+import urllib.request
+
+import pytest
+
+import loadtest
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 95) == 95
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile(values, 100) == 100
+    assert loadtest.percentile(values, 0) == 1
+
+
+def test_percentile_small_samples():
+    assert loadtest.percentile([], 50) is None
+    assert loadtest.percentile([7.5], 99) == 7.5
+    assert loadtest.percentile([1, 2, 3], 50) == 2
+    assert loadtest.percentile([1, 2, 3, 4], 50) == 2
+    assert loadtest.percentile([1, 2, 3, 4], 51) == 3
+
+
+def test_check_local_refuses_remote_hosts():
+    loadtest.check_local("http://127.0.0.1:5000")
+    loadtest.check_local("http://localhost:8000/")
+    with pytest.raises(ValueError):
+        loadtest.check_local("http://example.com")
+
+
+def test_memory_sampler_without_measurements(monkeypatch):
+    monkeypatch.setattr(loadtest, "rss_mb", lambda pid: None)
+    sampler = loadtest.MemorySampler(1)
+    sampler.start()
+    assert sampler.stop() is None
+
+
+def test_check_api_path_refuses_other_hosts():
+    loadtest.check_api_path("/api/parse")
+    for path in ("http://example.com/parse", "//example.com/parse", "api/parse"):
+        with pytest.raises(ValueError):
+            loadtest.check_api_path(path)
+
+
+class OkHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_send_bypasses_proxy(monkeypatch):
+    server = http.server.HTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("http_proxy", "http://proxy.invalid:3128")
+    monkeypatch.setenv("HTTP_PROXY", "http://proxy.invalid:3128")
+    monkeypatch.delenv("no_proxy", raising=False)
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    try:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/")
+        assert loadtest.send(request, "api")[1] is None
+    finally:
+        server.shutdown()
+        server.server_close()
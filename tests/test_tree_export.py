@@ -0,0 +1,158 @@
+# tests/test_tree_export.py
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future
+
+import pytest
+import spacy
+from spacy import displacy
+from spacy.language import Language
+
+import tree_export
+
+PARSE = "(S (NP (DT The) (NN cat)) (VP (VBD sat)) (. .))"
+
+# The stand-in pipeline has no dependency parser, which displaCy warns about
+pytestmark = pytest.mark.filterwarnings("ignore:.*W005")
+
+
+@Language.component("fake_benepar")
+def fake_benepar(doc):
+    """Stands in for benepar: a flat parse per sentence, and an error on request."""
+    if "fail" in doc.text:
+        raise ValueError("cannot parse this")
+    doc.user_data["parses"] = {sent.start: "(S " + " ".join(f"(X {token.text})" for token in sent) + ")"
+                               for sent in doc.sents}
+    return doc
+
+
+def test_constituency_svg_is_valid_xml():
+    root = ET.fromstring(tree_export.constituency_svg(PARSE))
+    texts = [element.text for element in root.iter("{http://www.w3.org/2000/svg}text")]
+    assert texts.count("NP") == 1
+    assert "cat" in texts and "VBD" in texts
+    assert float(root.get("width")) > 0
+
+
+def test_constituency_svg_escapes_labels():
+    svg = tree_export.constituency_svg("(S (NP (NNP AT&T)) (VP (VBD won)))")
+    assert "AT&amp;T" in svg
+    ET.fromstring(svg)
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    nlp.add_pipe("fake_benepar", name="benepar")
+    return nlp
+
+
+def test_render_job(nlp):
+    job = (0, "The cat sat.", PARSE, displacy.parse_deps(nlp("The cat sat.")))
+    index, sentence, files, error = tree_export.render_job(job, ("svg",))
+    assert (index, sentence, error) == (0, "The cat sat.", None)
+    assert [name for name, _ in files] == ["constituency/0001.svg", "dependency/0001.svg"]
+    for _, data in files:
+        assert isinstance(data, bytes)
+        ET.fromstring(data)
+
+
+def test_render_job_reports_errors():
+    index, sentence, files, error = tree_export.render_job((4, "Bad.", "(S (NP", None), ("svg",))
+    assert (index, files) == (4, [])
+    assert error.startswith("Rendering failed")
+
+
+def test_stream_zip_round_trip(nlp):
+    results = [
+        tree_export.render_job((0, "The cat sat.", PARSE, None), ("svg",)),
+        (1, "x" * 20, [], "Skipped: longer than 10 characters"),
+        tree_export.render_job((2, "Dogs bark, loudly.", None,
+                                displacy.parse_deps(nlp("Dogs bark, loudly."))), ("svg",)),
+    ]
+    chunks = list(tree_export.stream_zip(iter(results)))
+    assert len(chunks) > 1 # Streamed while rendering, not built in one piece
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ["constituency/0001.svg", "dependency/0003.svg", "index.csv"]
+        assert archive.read("constituency/0001.svg") == results[0][2][0][1]
+        rows = list(csv.reader(io.StringIO(archive.read("index.csv").decode("utf-8"))))
+    assert rows == [
+        ["number", "sentence", "error"],
+        ["0001", "The cat sat.", ""],
+        ["0002", "x" * 20, "Skipped: longer than 10 characters"],
+        ["0003", "Dogs bark, loudly.", ""],
+    ]
+
+
+def test_iter_rendered_on_process_pool(nlp):
+    # More sentences than one parse batch, with a skipped line and a failing one
+    sentences = [f"Sentence number {i} is here." for i in range(tree_export.PARSE_BATCH_SIZE + 4)]
+    sentences[3] = "This one will fail."
+    skipped = {1: "Skipped: test"}
+    results = list(tree_export.iter_rendered(nlp, sentences, ("svg",), tree_export.EXPORT_VIEWS,
+                                             workers=2, skipped=skipped))
+
+    assert [index for index, _, _, _ in results] == list(range(len(sentences)))
+    assert [sentence for _, sentence, _, _ in results] == sentences
+    assert results[1][2:] == ([], "Skipped: test")
+    assert results[3][2] == [] and results[3][3].startswith("Parsing failed")
+    for index, _, files, error in results:
+        if index not in (1, 3):
+            assert error is None
+            assert [name for name, _ in files] == [f"constituency/{index + 1:04d}.svg",
+                                                   f"dependency/{index + 1:04d}.svg"]
+
+
+class RecordingPool:
+    """Runs jobs inline and counts how many futures have been handed out."""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_iter_rendered_caps_jobs_in_flight(nlp, monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(tree_export, "get_pool", lambda workers: pool)
+    sentences = [f"Sentence {i}." for i in range(40)]
+    rendered = tree_export.iter_rendered(nlp, sentences, ("svg",), ("constituency",), workers=2)
+    consumed = 0
+    for _ in rendered:
+        consumed += 1
+        assert pool.submitted - consumed <= 2 * 2
+    assert consumed == pool.submitted == 40
+
+
+def test_export_zip_needs_benepar_for_constituency():
+    with pytest.raises(ValueError, match="benepar"):
+        tree_export.export_zip(spacy.blank("en"), ["The cat sat."], ("svg",), ("constituency",))
+    tree_export.export_zip(spacy.blank("en"), ["The cat sat."], ("svg",), ("dependency",))
+
+
+def test_stream_zip_empty():
+    with zipfile.ZipFile(io.BytesIO(b"".join(tree_export.stream_zip([])))) as archive:
+        assert archive.namelist() == ["index.csv"]
+
+
+def test_validate_options():
+    tree_export.validate_options(["svg"], ["constituency"])
+    with pytest.raises(ValueError):
+        tree_export.validate_options([], ["constituency"])
+    with pytest.raises(ValueError):
+        tree_export.validate_options(["svg"], ["sideways"])
+    with pytest.raises(ValueError):
+        tree_export.validate_options(["gif"], ["constituency"])
+
+
+def test_read_sentences():
+    assert tree_export.read_sentences(["A cat.\n", "  \n", " Dogs bark. "]) == ["A cat.", "Dogs bark."]
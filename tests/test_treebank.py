@@ -0,0 +1,198 @@
+# tests/test_treebank.py
+import pytest
+import spacy
+from spacy.tokens import Doc
+
+import treebank
+
+# (words, tags, heads relative to the sentence, deps, parse string)
+SUBORDINATE = (
+    ["I", "know", "that", "he", "left", "."],
+    ["PRP", "VBP", "IN", "PRP", "VBD", "."],
+    [1, 1, 4, 4, 1, 1],
+    ["nsubj", "ROOT", "mark", "nsubj", "ccomp", "punct"],
+    "(S (NP (PRP I)) (VP (VBP know) (SBAR (IN that) (S (NP (PRP he)) (VP (VBD left))))) (. .))",
+)
+ADJECTIVE = (
+    ["The", "big", "dog", "barked", "."],
+    ["DT", "JJ", "NN", "VBD", "."],
+    [2, 2, 3, 3, 3],
+    ["det", "amod", "nsubj", "ROOT", "punct"],
+    "(S (NP (DT The) (JJ big) (NN dog)) (VP (VBD barked)) (. .))",
+)
+PASSIVE = (
+    ["The", "cake", "was", "eaten", "."],
+    ["DT", "NN", "VBD", "VBN", "."],
+    [1, 3, 3, 3, 3],
+    ["det", "nsubjpass", "auxpass", "ROOT", "punct"],
+    "(S (NP (DT The) (NN cake)) (VP (VBD was) (VP (VBN eaten))) (. .))",
+)
+
+
+@pytest.fixture(scope="module")
+def vocab():
+    return spacy.blank("en").vocab
+
+
+def make_doc(vocab, sentences):
+    """Builds one parsed Doc from several (words, tags, heads, deps, parse) sentences."""
+    words, tags, heads, deps, sent_starts = [], [], [], [], []
+    parses = {}
+    for sent_words, sent_tags, sent_heads, sent_deps, parse in sentences:
+        offset = len(words)
+        parses[offset] = parse
+        words += sent_words
+        tags += sent_tags
+        heads += [offset + head for head in sent_heads]
+        deps += sent_deps
+        sent_starts += [True] + [False] * (len(sent_words) - 1)
+    doc = Doc(vocab, words=words, tags=tags, heads=heads, deps=deps, sent_starts=sent_starts)
+    doc.user_data["parses"] = parses
+    return doc
+
+
+@pytest.fixture
+def store(tmp_path, vocab):
+    store = treebank.TreebankStore(str(tmp_path / "treebank.sqlite3"))
+    store.add_doc(make_doc(vocab, [SUBORDINATE, ADJECTIVE, PASSIVE]))
+    return store
+
+
+def texts(page):
+    return [result["text"] for result in page["results"]]
+
+
+# --- Extraction helpers ---
+def test_constituency_facts():
+    labels, children, dominance = treebank.constituency_facts(SUBORDINATE[4])
+    assert {"S", "NP", "VP", "SBAR", "PRP", "VBD", "."} <= labels
+    assert "know" not in labels # Words are not labels
+    assert ("VP", "SBAR") in children
+    assert ("S", "SBAR") not in children
+    assert ("S", "SBAR") in dominance
+    assert ("SBAR", "VBD") in dominance
+
+
+def test_dependency_keys_wildcards():
+    keys = treebank.dependency_keys([("nsubj", "VBD", "PRP")])
+    assert len(keys) == 7
+    assert ("nsubj", "VBD", "PRP") in keys
+    assert ("nsubj", "*", "*") in keys
+    assert ("*", "VBD", "*") in keys
+    assert ("*", "*", "PRP") in keys
+    assert ("*", "*", "*") not in keys
+
+
+def test_dependency_keys_merges_triples():
+    keys = treebank.dependency_keys([("nsubj", "VBD", "PRP"), ("nsubj", "VBD", "NN")])
+    assert ("nsubj", "VBD", "*") in keys
+    assert len(keys) == 7 + 7 - 3 # rel/head_tag combinations are shared
+
+
+def test_pos_ngrams():
+    assert treebank.pos_ngrams(["DT", "NN", "VBD"]) == {
+        "DT", "NN", "VBD", "DT NN", "NN VBD", "DT NN VBD"}
+    assert treebank.pos_ngrams(["DT", "DT"], max_n=2) == {"DT", "DT DT"}
+# --- End extraction helpers ---
+
+
+# --- Storing ---
+def test_add_doc_skips_stored_sentences(store, vocab):
+    assert store.count() == 3
+    assert store.add_doc(make_doc(vocab, [ADJECTIVE])) == 0
+    assert store.count() == 3
+
+
+def test_add_doc_without_constituency(tmp_path, vocab):
+    store = treebank.TreebankStore(str(tmp_path / "deps_only.sqlite3"))
+    assert store.add_doc(make_doc(vocab, [ADJECTIVE]), constituency=False) == 1
+    assert store.search(pos="DT JJ NN")["results"][0]["parse_string"] is None
+    assert texts(store.search(label="NP")) == []
+# --- End storing ---
+
+
+# --- Searching ---
+def test_search_label(store):
+    assert texts(store.search(label="SBAR")) == ["I know that he left ."]
+    assert len(texts(store.search(label="NP"))) == 3
+
+
+def test_search_parent_and_ancestor(store):
+    assert texts(store.search(label="SBAR", parent="VP")) == ["I know that he left ."]
+    assert texts(store.search(label="SBAR", parent="S")) == []
+    assert texts(store.search(label="SBAR", ancestor="S")) == ["I know that he left ."]
+    assert texts(store.search(label="VBN", ancestor="VP")) == ["The cake was eaten ."]
+
+
+def test_search_dependencies(store):
+    assert texts(store.search(dep="nsubj", head_tag="VBD")) == [
+        "I know that he left .", "The big dog barked ."]
+    assert texts(store.search(dep="nsubj", head_tag="VBD", dep_tag="NN")) == ["The big dog barked ."]
+    assert texts(store.search(head_tag="VBN")) == ["The cake was eaten ."]
+    assert texts(store.search(dep_tag="JJ")) == ["The big dog barked ."]
+    assert texts(store.search(dep="amod", head_tag="VBD")) == []
+
+
+def test_search_combines_conditions(store):
+    assert texts(store.search(dep="nsubj", label="SBAR")) == ["I know that he left ."]
+    assert texts(store.search(dep="nsubjpass", label="SBAR", parent="VP")) == []
+
+
+def test_search_pos_ngram(store):
+    assert texts(store.search(pos="DT JJ NN")) == ["The big dog barked ."]
+    assert texts(store.search(pos="DT NN")) == ["The cake was eaten ."]
+    assert len(texts(store.search(pos="DT"))) == 2
+
+
+def test_search_long_pos_sequence(store):
+    assert texts(store.search(pos="DT NN VBD VBN .")) == ["The cake was eaten ."]
+    assert texts(store.search(pos="DT JJ NN VBD VBN")) == []
+
+
+def test_search_long_pos_sequence_needs_contiguous_match(tmp_path, vocab):
+    # Contains both trigrams of "NN VBD NN VBD NN" but not the sequence itself
+    store = treebank.TreebankStore(str(tmp_path / "pos.sqlite3"))
+    store.add_doc(make_doc(vocab, [(["a", "b", "c", "d"], ["NN", "VBD", "NN", "VBD"],
+                                    [1, 1, 1, 1], ["dep", "ROOT", "dep", "dep"], None)]),
+                  constituency=False)
+    assert texts(store.search(pos="NN VBD NN VBD")) == ["a b c d"]
+    assert texts(store.search(pos="NN VBD NN VBD NN")) == []
+
+
+def test_search_keyset_paging(tmp_path, vocab):
+    store = treebank.TreebankStore(str(tmp_path / "paging.sqlite3"))
+    sentences = [([f"Dogs{i}", "bark"], ["NNS", "VBP"], [1, 1], ["nsubj", "ROOT"], None)
+                 for i in range(25)]
+    store.add_doc(make_doc(vocab, sentences), constituency=False)
+
+    seen, after, pages = [], 0, 0
+    while after is not None:
+        page = store.search(pos="NNS VBP", after=after, limit=10)
+        ids = [result["id"] for result in page["results"]]
+        assert ids == sorted(ids)
+        assert not seen or ids[0] > seen[-1]
+        seen += ids
+        after = page["next_after"]
+        pages += 1
+    assert pages == 3
+    assert len(seen) == 25 == len(set(seen))
+
+
+def test_search_exact_last_page_has_no_cursor(store):
+    page = store.search(label="NP", limit=3)
+    assert len(page["results"]) == 3
+    assert page["next_after"] is None
+
+
+def test_search_clamps_limit(store):
+    assert len(store.search(label="NP", limit=0)["results"]) == 1
+
+
+def test_search_rejects_incomplete_queries(store):
+    with pytest.raises(ValueError):
+        store.search(parent="VP")
+    with pytest.raises(ValueError):
+        store.search(ancestor="S")
+    with pytest.raises(ValueError):
+        store.search()
+# --- End searching ---
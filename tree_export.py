@@ -0,0 +1,400 @@
+# tree_export.py
+"""
+Headless bulk export of syntax tree images.
+
+Renders the constituency tree (same layout as the D3 view) and the displaCy
+dependency view for many sentences to SVG, PNG or PDF without a browser, and
+streams the results back as a zip archive while rendering is still going on.
+Sentences are parsed in batches with nlp.pipe() in the calling process, which
+holds the only copy of the model; the worker pool turns the parse data into images.
+
+Command line usage:
+    python tree_export.py sentences.txt -o trees.zip --formats svg,png
+"""
+import argparse
+import csv
+import io
+import multiprocessing
+import signal
+import sys
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+import nltk
+from spacy import displacy
+
+import input_guard
+
+# PNG/PDF output needs cairosvg; SVG export works without it
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+EXPORT_FORMATS = ("svg", "png", "pdf")
+EXPORT_VIEWS = ("constituency", "dependency")
+EXPORT_WORKERS = 2 # Render processes shared by all exports
+PARSE_BATCH_SIZE = 16 # Sentences per nlp.pipe() call
+
+# Same look as the dependency view on the web page
+DEPENDENCY_OPTIONS = {
+    'compact': True,
+    'bg': '#fafafa',
+    'color': '#333333',
+    'font': 'Arial, sans-serif',
+    'distance': 120
+}
+
+# --- Constituency tree layout (mirrors the D3 styles in index.html) ---
+LEVEL_HEIGHT = 80   # Vertical distance between tree levels
+CHAR_WIDTH = 7      # Approximate width of one character at 12px
+MIN_LEAF_WIDTH = 40
+MARGIN = 20
+
+
+def _leaf_width(tree):
+    """Horizontal space reserved for a preterminal (POS tag + word)."""
+    text = tree[0] if len(tree) == 1 and isinstance(tree[0], str) else ""
+    return max(MIN_LEAF_WIDTH, CHAR_WIDTH * max(len(tree.label()), len(text)) + 16)
+
+
+def _layout_tree(tree, depth, cursor, nodes, links):
+    """
+    Assigns x/y positions to every node. Preterminals are laid out left to right,
+    internal nodes are centred over their first and last child.
+    Returns the node's (x, y) position and the advanced cursor.
+    """
+    is_preterminal = len(tree) == 1 and isinstance(tree[0], str)
+    if is_preterminal or all(isinstance(child, str) for child in tree):
+        width = _leaf_width(tree)
+        x = cursor + width / 2
+        text = " ".join(child for child in tree if isinstance(child, str))
+        y = depth * LEVEL_HEIGHT
+        nodes.append((x, y, tree.label(), text))
+        return (x, y), cursor + width
+
+    child_positions = []
+    for child in tree:
+        if isinstance(child, str):
+            continue
+        position, cursor = _layout_tree(child, depth + 1, cursor, nodes, links)
+        child_positions.append(position)
+    x = (child_positions[0][0] + child_positions[-1][0]) / 2
+    y = depth * LEVEL_HEIGHT
+    for child_x, child_y in child_positions:
+        links.append((x, y, child_x, child_y))
+    nodes.append((x, y, tree.label(), None))
+    return (x, y), cursor
+
+
+def constituency_svg(parse_string):
+    """Renders a bracketed constituency parse string as a standalone SVG document."""
+    tree = nltk.Tree.fromstring(parse_string)
+    nodes, links = [], []
+    _, total_width = _layout_tree(tree, 0, 0, nodes, links)
+    max_y = max(y for _, y, _, _ in nodes)
+    width = total_width + 2 * MARGIN
+    height = max_y + 2 * MARGIN + 40
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" height="{height:.0f}" '
+        f'viewBox="0 0 {width:.0f} {height:.0f}">',
+        '<style>'
+        '.link{fill:none;stroke:#ccc;stroke-width:2px}'
+        '.node circle{fill:#fff;stroke:steelblue;stroke-width:3px}'
+        '.node text{font:12px sans-serif;text-anchor:middle}'
+        '.node .label{fill:#007bff;font-weight:bold}'
+        '.node .text{fill:#28a745;font-style:italic}'
+        '</style>',
+        '<rect width="100%" height="100%" fill="#ffffff"/>',
+        f'<g transform="translate({MARGIN},{MARGIN + 10})">',
+    ]
+    # Links first so the node circles are drawn on top
+    for parent_x, parent_y, child_x, child_y in links:
+        mid_y = (parent_y + child_y) / 2
+        parts.append(
+            f'<path class="link" d="M{parent_x:.1f},{parent_y:.1f}'
+            f'C{parent_x:.1f},{mid_y:.1f} {child_x:.1f},{mid_y:.1f} {child_x:.1f},{child_y:.1f}"/>'
+        )
+    for x, y, label, text in nodes:
+        parts.append(f'<g class="node" transform="translate({x:.1f},{y:.1f})">')
+        parts.append('<circle r="5"/>')
+        parts.append(f'<text class="label" dy="-0.8em">{escape(label)}</text>')
+        if text:
+            parts.append(f'<text class="text" dy="1.8em">{escape(text)}</text>')
+        parts.append('</g>')
+    parts.append('</g></svg>')
+    return "".join(parts)
+# --- End constituency tree layout ---
+
+
+def dependency_svg(parsed_deps):
+    """Renders displaCy's parsed dependency data (from displacy.parse_deps) as SVG."""
+    return displacy.render(parsed_deps, style="dep", manual=True, page=False,
+                           jupyter=False, options=DEPENDENCY_OPTIONS)
+
+
+def _convert(svg, fmt):
+    """Converts an SVG document to the requested output format."""
+    if fmt == "svg":
+        return svg.encode("utf-8")
+    if fmt == "png":
+        return cairosvg.svg2png(bytestring=svg.encode("utf-8"))
+    return cairosvg.svg2pdf(bytestring=svg.encode("utf-8"))
+
+
+def render_job(job, formats):
+    """
+    Worker entry point. Takes the picklable parse data for one sentence and returns
+    (index, sentence, [(filename, bytes), ...], error).
+    Runs in a worker process, so it must not touch the spaCy pipeline.
+    """
+    index, sentence, parse_string, parsed_deps = job
+    stem = f"{index + 1:04d}"
+    files = []
+    try:
+        svgs = []
+        if parse_string is not None:
+            svgs.append(("constituency", constituency_svg(parse_string)))
+        if parsed_deps is not None:
+            svgs.append(("dependency", dependency_svg(parsed_deps)))
+        for view, svg in svgs:
+            for fmt in formats:
+                files.append((f"{view}/{stem}.{fmt}", _convert(svg, fmt)))
+    except Exception as e:
+        return index, sentence, [], f"Rendering failed: {e}"
+    return index, sentence, files, None
+
+
+def _render_input(doc, index, sentence, views):
+    """Extracts the picklable render input for one parsed sentence."""
+    parse_string = None
+    parsed_deps = None
+    if "constituency" in views:
+        sent = list(doc.sents)[0] # First sentence, as in the web view
+        parse_string = sent._.parse_string
+    if "dependency" in views:
+        parsed_deps = displacy.parse_deps(doc, DEPENDENCY_OPTIONS)
+    return index, sentence, parse_string, parsed_deps
+
+
+def _parse_batch(nlp, items, views):
+    """
+    Parses [(index, sentence), ...] with one nlp.pipe() call in the calling process.
+    If the batch fails, its sentences are retried one by one.
+    Returns {index: (render job, None) or (None, error)}.
+    """
+    try:
+        docs = list(nlp.pipe([sentence for _, sentence in items]))
+    except Exception as e:
+        print(f"Error parsing batch, retrying sentence by sentence: {e}")
+        docs = None
+    parsed = {}
+    for position, (index, sentence) in enumerate(items):
+        try:
+            doc = docs[position] if docs is not None else nlp(sentence)
+            parsed[index] = (_render_input(doc, index, sentence, views), None)
+        except Exception as e:
+            print(f"Error parsing sentence '{sentence}': {e}")
+            parsed[index] = (None, f"Parsing failed: {e}")
+    return parsed
+
+
+def validate_options(formats, views):
+    """Raises ValueError for unknown or unavailable formats/views."""
+    if not formats:
+        raise ValueError("No export format selected.")
+    if not views:
+        raise ValueError("No tree view selected.")
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(unknown)}")
+    unknown = [v for v in views if v not in EXPORT_VIEWS]
+    if unknown:
+        raise ValueError(f"Unknown tree view(s): {', '.join(unknown)}")
+    if cairosvg is None and any(f != "svg" for f in formats):
+        raise ValueError("PNG/PDF export requires the 'cairosvg' package.")
+
+
+def check_pipeline(nlp, views):
+    """Raises ValueError if the pipeline cannot produce the requested views."""
+    if "constituency" in views and 'benepar' not in nlp.pipe_names:
+        raise ValueError("Constituency parsing component (benepar) not loaded.")
+
+
+# --- Render pool ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """Render workers leave Ctrl+C to the parent, which shuts the pool down."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_pool(workers=EXPORT_WORKERS):
+    """
+    Returns the render pool shared by all exports, creating it on first use.
+    The worker count is fixed by the first call.
+
+    Workers are spawned, never forked from a process that holds the torch/benepar
+    model. Spawned workers re-import the __main__ script under the name
+    '__mp_main__', so entry scripts must not load the models at import time
+    under that name (see app.py).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker)
+        return _pool
+# --- End render pool ---
+
+
+def iter_rendered(nlp, sentences, formats=("svg",), views=EXPORT_VIEWS, workers=EXPORT_WORKERS,
+                  skipped=None):
+    """
+    Parses sentences in batches (nlp.pipe) and renders them on the shared process pool.
+    Yields (index, sentence, files, error) in input order. At most a few jobs
+    per worker are in flight, so memory stays flat regardless of input size.
+    skipped maps input indexes to a reason (see input_guard.screen_lines);
+    those lines are listed with the reason instead of being parsed.
+    """
+    pool = get_pool(workers)
+    max_in_flight = workers * 2
+    skipped = skipped or {}
+    pending = deque()
+    for start in range(0, len(sentences), PARSE_BATCH_SIZE):
+        batch = list(enumerate(sentences[start:start + PARSE_BATCH_SIZE], start))
+        parsed = _parse_batch(nlp, [item for item in batch if item[0] not in skipped], views)
+        for index, sentence in batch:
+            if index in skipped:
+                pending.append((index, sentence, [], skipped[index]))
+            else:
+                job, error = parsed[index]
+                pending.append(pool.submit(render_job, job, tuple(formats)) if job
+                               else (index, sentence, [], error))
+            while len(pending) > max_in_flight:
+                yield _result(pending.popleft())
+    while pending:
+        yield _result(pending.popleft())
+
+
+def _result(item):
+    """Resolves a pending entry, which is either a future or a finished error tuple."""
+    return item if isinstance(item, tuple) else item.result()
+
+
+# --- Streaming zip writer ---
+class _ZipStream(io.RawIOBase):
+    """Write-only, non-seekable buffer; zipfile then emits data descriptors."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(results):
+    """
+    Writes rendered results into a zip archive and yields its bytes chunk by chunk.
+    An index.csv manifest mapping file numbers to sentences is appended at the end.
+    """
+    stream = _ZipStream()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["number", "sentence", "error"])
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, sentence, files, error in results:
+            for filename, data in files:
+                archive.writestr(filename, data)
+            writer.writerow([f"{index + 1:04d}", sentence, error or ""])
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+        archive.writestr("index.csv", manifest.getvalue())
+    yield stream.drain()
+# --- End streaming zip writer ---
+
+
+def export_zip(nlp, sentences, formats=("svg",), views=EXPORT_VIEWS, workers=EXPORT_WORKERS,
+               skipped=None):
+    """
+    Validates options and the pipeline, then returns a generator of zip bytes for the
+    given sentences. Raises ValueError before anything is parsed if they do not fit.
+    Lines in skipped (from input_guard.screen_lines) are listed in index.csv only.
+    """
+    validate_options(formats, views)
+    check_pipeline(nlp, views)
+    return stream_zip(iter_rendered(nlp, sentences, formats, views, workers, skipped))
+
+
+def read_sentences(lines):
+    """One sentence per line; blank lines are skipped."""
+    return [line.strip() for line in lines if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export syntax tree images for many sentences as a zip archive.")
+    parser.add_argument("input", help="Text file with one sentence per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="trees.zip", help="Output zip file (default: trees.zip)")
+    parser.add_argument("--formats", default="svg", help="Comma-separated list of svg, png, pdf (default: svg)")
+    parser.add_argument("--views", default=",".join(EXPORT_VIEWS),
+                        help="Comma-separated list of constituency, dependency (default: both)")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS,
+                        help=f"Number of render processes (default: {EXPORT_WORKERS})")
+    parser.add_argument("--max-lines", type=int,
+                        help=f"Lines exported per run (default: MAX_BULK_LINES or {input_guard.MAX_BULK_LINES})")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    views = [v.strip().lower() for v in args.views.split(",") if v.strip()]
+    try:
+        validate_options(formats, views)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.input == "-":
+        sentences = read_sentences(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            sentences = read_sentences(f)
+
+    import model_bundle
+    nlp = model_bundle.load_pipeline()
+    try:
+        check_pipeline(nlp, views)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    limits = input_guard.bulk_limits(args.max_lines)
+    beyond_limit = len(sentences) - limits['max_lines']
+    if beyond_limit > 0:
+        sentences = sentences[:limits['max_lines']]
+        print(f"Only the first {limits['max_lines']} lines are exported; "
+              f"{beyond_limit} line(s) left out (see --max-lines).")
+    skipped = input_guard.screen_lines(sentences, **limits)
+    with open(args.output, "wb") as out:
+        for chunk in export_zip(nlp, sentences, formats, views, args.workers, skipped):
+            out.write(chunk)
+    print(f"Exported {len(sentences) - len(skipped)} sentence(s) to {args.output}"
+          + (f"; {len(skipped)} line(s) skipped, see index.csv" if skipped else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+# treebank.py
+"""
+Indexed treebank store backed by SQLite.
+
+Every parsed sentence is saved once (keyed by its text) together with its
+constituency parse string and POS sequence. Structural facts are written to
+small index tables so searches are index range scans instead of re-parsing:
+
+    labels        constituency labels per sentence        ("has an SBAR")
+    children      direct parent -> child label pairs       ("SBAR directly under VP")
+    dominance     ancestor -> descendant label pairs       ("SBAR anywhere under VP")
+    dependencies  relation, head tag and dependent tag     ("nsubj whose head is a VBN"),
+                  plus '*' wildcard rows so any combination is a key prefix
+    pos_ngrams    POS uni-, bi- and trigrams               ("DT JJ NN" sequences)
+
+Results are paged with a keyset cursor (the last sentence id seen), so each page
+costs the same no matter how deep into the results it is.
+
+Command line usage:
+    python treebank.py import sentences.txt
+    python treebank.py search --parent VP --label SBAR
+    python treebank.py search --dep nsubj --head-tag VBN --limit 50 --after 1200
+"""
+import argparse
+import os
+import sqlite3
+import threading
+
+import nltk
+
+import input_guard
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "treebank.sqlite3")
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 500
+POS_NGRAM_SIZE = 3  # Longest POS n-gram stored in the index
+WILDCARD = "*"      # Stands for "any value" in the dependencies index
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentences (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE,
+    parse_string TEXT,
+    pos_sequence TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS labels (
+    label TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    PRIMARY KEY (label, sentence_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS children (
+    parent TEXT NOT NULL,
+    child TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    PRIMARY KEY (parent, child, sentence_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dominance (
+    ancestor TEXT NOT NULL,
+    descendant TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    PRIMARY KEY (ancestor, descendant, sentence_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dependencies (
+    rel TEXT NOT NULL,
+    head_tag TEXT NOT NULL,
+    dep_tag TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    PRIMARY KEY (rel, head_tag, dep_tag, sentence_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pos_ngrams (
+    ngram TEXT NOT NULL,
+    sentence_id INTEGER NOT NULL,
+    PRIMARY KEY (ngram, sentence_id)
+) WITHOUT ROWID;
+"""
+
+
+# --- Extraction helpers ---
+def constituency_facts(parse_string):
+    """
+    Returns (labels, children, dominance) sets for a bracketed parse string.
+    Preterminal (POS) labels are included, words are not.
+    """
+    tree = nltk.Tree.fromstring(parse_string)
+    labels, children, dominance = set(), set(), set()
+
+    def walk(node, ancestors):
+        label = node.label()
+        labels.add(label)
+        if ancestors:
+            children.add((ancestors[-1], label))
+            dominance.update((ancestor, label) for ancestor in ancestors)
+        for child in node:
+            if not isinstance(child, str): # Ignore leaf strings (words)
+                walk(child, ancestors + [label])
+
+    walk(tree, [])
+    return labels, children, dominance
+
+
+def dependency_keys(triples):
+    """
+    Expands (rel, head_tag, dep_tag) triples with every wildcard combination, so a
+    search on any subset of the three is an exact key-prefix lookup.
+    """
+    keys = set()
+    for rel, head_tag, dep_tag in triples:
+        for r in (rel, WILDCARD):
+            for h in (head_tag, WILDCARD):
+                for d in (dep_tag, WILDCARD):
+                    keys.add((r, h, d))
+    keys.discard((WILDCARD, WILDCARD, WILDCARD))
+    return keys
+
+
+def pos_ngrams(tags, max_n=POS_NGRAM_SIZE):
+    """All distinct POS n-grams up to max_n, space-joined."""
+    return {" ".join(tags[i:i + n])
+            for n in range(1, max_n + 1)
+            for i in range(len(tags) - n + 1)}
+# --- End extraction helpers ---
+
+
+class TreebankStore:
+    """SQLite treebank. Safe to share between threads (one connection per thread)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Writing ---
+    def add_doc(self, doc, constituency=True):
+        """
+        Stores every sentence of a parsed spaCy Doc. Sentences already in the store
+        are skipped. Set constituency=False when benepar is not in the pipeline.
+        Returns the number of newly stored sentences.
+        """
+        added = 0
+        with self._connect() as conn:
+            for sent in doc.sents:
+                parse_string = sent._.parse_string if constituency else None
+                if self._add_sentence(conn, sent, parse_string):
+                    added += 1
+        return added
+
+    def add_docs(self, docs, constituency=True):
+        """Stores an iterable of Docs (e.g. from nlp.pipe). Returns the number of new sentences."""
+        return sum(self.add_doc(doc, constituency) for doc in docs)
+
+    def _add_sentence(self, conn, sent, parse_string):
+        tags = [token.tag_ for token in sent]
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO sentences (text, parse_string, pos_sequence) VALUES (?, ?, ?)",
+            (sent.text.strip(), parse_string, " ".join(tags)))
+        if cursor.rowcount == 0:
+            return False # Already stored
+        sentence_id = cursor.lastrowid
+
+        if parse_string:
+            labels, children, dominance = constituency_facts(parse_string)
+            conn.executemany("INSERT INTO labels VALUES (?, ?)",
+                             [(label, sentence_id) for label in labels])
+            conn.executemany("INSERT INTO children VALUES (?, ?, ?)",
+                             [(parent, child, sentence_id) for parent, child in children])
+            conn.executemany("INSERT INTO dominance VALUES (?, ?, ?)",
+                             [(ancestor, label, sentence_id) for ancestor, label in dominance])
+
+        deps = dependency_keys((token.dep_, token.head.tag_, token.tag_) for token in sent)
+        conn.executemany("INSERT INTO dependencies VALUES (?, ?, ?, ?)",
+                         [(rel, head_tag, dep_tag, sentence_id) for rel, head_tag, dep_tag in deps])
+        conn.executemany("INSERT INTO pos_ngrams VALUES (?, ?)",
+                         [(ngram, sentence_id) for ngram in pos_ngrams(tags)])
+        return True
+    # --- End writing ---
+
+    # --- Searching ---
+    def search(self, label=None, parent=None, ancestor=None,
+               dep=None, head_tag=None, dep_tag=None, pos=None,
+               after=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        Finds stored sentences matching all given conditions.
+
+        label                  constituent label, e.g. "SBAR"
+        parent / ancestor      with label: label directly under / anywhere under this label
+        dep, head_tag, dep_tag dependency relation, tag of its head, tag of the dependent
+        pos                    POS tag sequence, e.g. "DT JJ NN"
+        after, limit           keyset paging: pass the previous page's 'next_after'
+
+        Returns {'results': [{'id', 'text', 'parse_string'}, ...], 'next_after': id or None}.
+        """
+        if (parent or ancestor) and not label:
+            raise ValueError("'parent' and 'ancestor' need a 'label' to look for.")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        # Each condition is an equality match on a primary key that ends in sentence_id,
+        # so matching sentences come out of the index already in id order
+        conditions = []
+        if label and parent:
+            conditions.append(("children", {"parent": parent, "child": label}))
+        if label and ancestor:
+            conditions.append(("dominance", {"ancestor": ancestor, "descendant": label}))
+        if dep or head_tag or dep_tag:
+            conditions.append(("dependencies", {"rel": dep or WILDCARD,
+                                                "head_tag": head_tag or WILDCARD,
+                                                "dep_tag": dep_tag or WILDCARD}))
+
+        pos_tags = pos.split() if pos else []
+        if pos_tags:
+            if len(pos_tags) <= POS_NGRAM_SIZE:
+                conditions.append(("pos_ngrams", {"ngram": " ".join(pos_tags)}))
+            else:
+                # Longer sequences: every trigram must occur, then verify the full sequence
+                for ngram in sorted(pos_ngrams(pos_tags, POS_NGRAM_SIZE)):
+                    if len(ngram.split()) == POS_NGRAM_SIZE:
+                        conditions.append(("pos_ngrams", {"ngram": ngram}))
+        # A bare label is the least selective condition, so it never drives the scan
+        if label and not (parent or ancestor):
+            conditions.append(("labels", {"label": label}))
+
+        if not conditions:
+            raise ValueError("Give at least one search condition.")
+
+        # The first condition drives the scan in sentence_id order; the rest are
+        # primary-key lookups per candidate.
+        driver_table, driver_filter = conditions[0]
+        where = [f"d.{column} = ?" for column in driver_filter]
+        params = list(driver_filter.values())
+        where.append("d.sentence_id > ?")
+        params.append(int(after))
+        for i, (table, filters) in enumerate(conditions[1:]):
+            checks = " AND ".join(f"c{i}.{column} = ?" for column in filters)
+            where.append(f"EXISTS (SELECT 1 FROM {table} c{i} "
+                         f"WHERE {checks} AND c{i}.sentence_id = d.sentence_id)")
+            params.extend(filters.values())
+        if len(pos_tags) > POS_NGRAM_SIZE:
+            where.append("(' ' || s.pos_sequence || ' ') LIKE ?")
+            params.append(f"% {' '.join(pos_tags)} %")
+
+        sql = (f"SELECT s.id, s.text, s.parse_string FROM {driver_table} d "
+               f"JOIN sentences s ON s.id = d.sentence_id "
+               f"WHERE {' AND '.join(where)} ORDER BY d.sentence_id LIMIT ?")
+        params.append(limit + 1) # One extra row tells us whether there is a next page
+
+        rows = self._connect().execute(sql, params).fetchall()
+        results = [{"id": row[0], "text": row[1], "parse_string": row[2]} for row in rows[:limit]]
+        next_after = results[-1]["id"] if len(rows) > limit else None
+        return {"results": results, "next_after": next_after}
+
+    def count(self):
+        """Number of stored sentences."""
+        return self._connect().execute("SELECT COUNT(*) FROM sentences").fetchone()[0]
+    # --- End searching ---
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and search the local treebank.")
+    parser.add_argument("--db", default=DEFAULT_PATH, help=f"SQLite file (default: {DEFAULT_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import", help="Parse a text file (one sentence per line) into the store")
+    import_cmd.add_argument("input")
+    import_cmd.add_argument("--batch-size", type=int, default=64)
+    import_cmd.add_argument("--max-lines", type=int,
+                            help=f"Lines imported per run (default: MAX_BULK_LINES or {input_guard.MAX_BULK_LINES})")
+
+    search_cmd = commands.add_parser("search", help="Search stored trees")
+    search_cmd.add_argument("--label", help="Constituent label, e.g. SBAR")
+    search_cmd.add_argument("--parent", help="Label must be directly under this label")
+    search_cmd.add_argument("--ancestor", help="Label must be anywhere under this label")
+    search_cmd.add_argument("--dep", help="Dependency relation, e.g. nsubj")
+    search_cmd.add_argument("--head-tag", help="Tag of the relation's head, e.g. VBN")
+    search_cmd.add_argument("--dep-tag", help="Tag of the dependent")
+    search_cmd.add_argument("--pos", help="POS sequence, e.g. 'DT JJ NN'")
+    search_cmd.add_argument("--after", type=int, default=0, help="Cursor from the previous page")
+    search_cmd.add_argument("--limit", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args(argv)
+
+    store = TreebankStore(args.db)
+    if args.command == "import":
+        import model_bundle
+        nlp = model_bundle.load_pipeline()
+        with open(args.input, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        limits = input_guard.bulk_limits(args.max_lines)
+        beyond_limit = max(0, len(lines) - limits['max_lines'])
+        lines = lines[:limits['max_lines']]
+        skipped = input_guard.screen_lines(lines, **limits)
+        for index, reason in sorted(skipped.items()):
+            print(f"Line {index + 1}: {reason}")
+        if beyond_limit:
+            print(f"Only the first {limits['max_lines']} lines are imported; "
+                  f"{beyond_limit} line(s) left out (see --max-lines).")
+        lines = [line for index, line in enumerate(lines) if index not in skipped]
+        added = store.add_docs(nlp.pipe(lines, batch_size=args.batch_size),
+                               constituency='benepar' in nlp.pipe_names)
+        print(f"Stored {added} new sentence(s); {store.count()} in total; "
+              f"{len(skipped) + beyond_limit} line(s) skipped.")
+        return
+
+    try:
+        page = store.search(label=args.label, parent=args.parent, ancestor=args.ancestor,
+                            dep=args.dep, head_tag=args.head_tag, dep_tag=args.dep_tag,
+                            pos=args.pos, after=args.after, limit=args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    for result in page["results"]:
+        print(f"{result['id']}\t{result['text']}")
+    if page["next_after"] is not None:
+        print(f"-- more results: --after {page['next_after']}")
+
+
+if __name__ == '__main__':
+    main()